@@ -7,7 +7,10 @@ const express = require('express');
 const cors = require('cors');
 const axios = require('axios');
 const fs = require('fs');
+const http = require('http');
+const https = require('https');
 const path = require('path');
+const readline = require('readline');
 require('dotenv').config();
 
 const app = express();
@@ -15,6 +18,14 @@ const PORT = process.env.PORT || 5000;
 const NODE_ENV = process.env.NODE_ENV || 'development';
 const PYTHON_API = process.env.PYTHON_API || 'http://localhost:8001';
 
+// Shared client with keep-alive so proxied calls (and the fan-out in
+// /api/predict/batch) reuse connections instead of opening one per request
+const pythonApi = axios.create({
+    baseURL: PYTHON_API,
+    httpAgent: new http.Agent({ keepAlive: true }),
+    httpsAgent: new https.Agent({ keepAlive: true })
+});
+
 // CORS Configuration
 const allowedOrigins = process.env.CORS_ORIGINS
     ? process.env.CORS_ORIGINS.split(',')
@@ -45,6 +56,235 @@ app.use((req, res, next) => {
     next();
 });
 
+// Read a non-negative integer setting, falling back on malformed values
+function envInt(name, fallback) {
+    const value = parseInt(process.env[ name ]);
+    return Number.isFinite(value) && value >= 0 ? value : fallback;
+}
+
+// Response caches (TTL). Entries hold serialized JSON so cache hits skip
+// JSON.stringify. Proxied endpoints that only change on a data refresh use
+// responseCache; /api/history has its own map so per-symbol entries cannot
+// push the polled endpoints out.
+const CACHE_TTL_MS = envInt('CACHE_TTL_MS', 60000);
+const HISTORY_CACHE_TTL_MS = envInt('HISTORY_CACHE_TTL_MS', 5000);
+const CACHE_MAX_ENTRIES = 64;
+const HISTORY_CACHE_MAX_ENTRIES = 512;
+const responseCache = new Map();
+const historyCache = new Map();
+
+function cacheGet(cache, key) {
+    const entry = cache.get(key);
+    if (!entry) return undefined;
+    if (entry.expires < Date.now()) {
+        cache.delete(key);
+        return undefined;
+    }
+    return entry.value;
+}
+
+function cacheSet(cache, key, value, ttl, maxEntries) {
+    // Evict the oldest entry once the cache is full
+    if (!cache.has(key) && cache.size >= maxEntries) {
+        cache.delete(cache.keys().next().value);
+    }
+    cache.set(key, { value, expires: Date.now() + ttl });
+}
+
+// Historical data (parsed once and reused until the file changes on disk)
+const DATA_PATH = path.join(__dirname, '../../processed/combined_1s.csv');
+
+// Read asynchronously so the event loop keeps serving other endpoints
+async function loadHistoryTable() {
+    try {
+        await fs.promises.access(DATA_PATH);
+    } catch (error) {
+        console.warn(`⚠️  Data file not found: ${DATA_PATH}`);
+        return null;
+    }
+
+    // Stream line by line so the raw file is never held in memory as one
+    // string plus an array of every line
+    const lines = readline.createInterface({
+        input: fs.createReadStream(DATA_PATH, { encoding: 'utf-8' }),
+        crlfDelay: Infinity
+    });
+
+    let symbolIndex, datetimeIndex, priceIndex, volumeIndex;
+
+    // Rows are grouped by symbol and kept as columns (datetime strings plus
+    // Float64Array price/volume) rather than one object per row; response
+    // objects are only built for the points a request returns
+    const bySymbol = new Map();
+    const datetimes = new Map();
+    for await (const line of lines) {
+        if (symbolIndex === undefined) {
+            const headers = line.split(',');
+            symbolIndex = headers.indexOf('symbol');
+            datetimeIndex = headers.indexOf('datetime');
+            priceIndex = headers.indexOf('price');
+            volumeIndex = headers.indexOf('volume');
+            if (symbolIndex === -1 || datetimeIndex === -1 || priceIndex === -1) {
+                lines.close();
+                throw new Error('Data file is missing a symbol, datetime or price column');
+            }
+            continue;
+        }
+        if (!line) continue;
+        const row = line.split(',');
+        // Skip rows too short to hold the required columns, e.g. a truncated
+        // last line while the file is being rewritten
+        if (row.length <= Math.max(symbolIndex, datetimeIndex, priceIndex)) continue;
+        const symbol = row[ symbolIndex ];
+        if (!bySymbol.has(symbol)) {
+            bySymbol.set(symbol, { datetime: [], price: [], volume: [] });
+        }
+        const columns = bySymbol.get(symbol);
+        // Timestamps repeat across symbols, so keep one copy of each. A
+        // substring from split() would keep its whole source line alive;
+        // concatenating builds a new string, and slicing it back only
+        // references that short copy.
+        let datetime = datetimes.get(row[ datetimeIndex ]);
+        if (datetime === undefined) {
+            datetime = (' ' + row[ datetimeIndex ]).slice(1);
+            datetimes.set(datetime, datetime);
+        }
+        columns.datetime.push(datetime);
+        columns.price.push(parseFloat(row[ priceIndex ]));
+        columns.volume.push(parseFloat(row[ volumeIndex ] || 0));
+    }
+
+    for (const [ symbol, columns ] of bySymbol) {
+        bySymbol.set(symbol, toSortedColumns(columns));
+    }
+    return bySymbol;
+}
+
+// Pack one symbol's columns into typed arrays, sorted by datetime once here
+// rather than per request
+function toSortedColumns({ datetime, price, volume }) {
+    let order = null;
+    for (let i = 1; i < datetime.length; i++) {
+        if (datetime[ i - 1 ] > datetime[ i ]) {
+            order = datetime.map((_, j) => j);
+            order.sort((a, b) => (datetime[ a ] < datetime[ b ] ? -1 : datetime[ a ] > datetime[ b ] ? 1 : 0));
+            break;
+        }
+    }
+    if (!order) {
+        return { datetime, price: Float64Array.from(price), volume: Float64Array.from(volume) };
+    }
+    return {
+        datetime: order.map((j) => datetime[ j ]),
+        price: Float64Array.from(order, (j) => price[ j ]),
+        volume: Float64Array.from(order, (j) => volume[ j ])
+    };
+}
+
+// Result of the last finished load: the table, the file mtime it was read at
+// and the error if the file exists but could not be parsed (table is null
+// when the file was missing or failed to load)
+let historyState = null;
+let historyLoad = null;
+let historyFollowUp = null;
+
+async function getDataMtime() {
+    try {
+        return (await fs.promises.stat(DATA_PATH)).mtimeMs;
+    } catch (error) {
+        return null;
+    }
+}
+
+function startHistoryLoad() {
+    historyLoad = (async () => {
+        const mtime = await getDataMtime();
+        let table = null;
+        let error = null;
+        try {
+            table = await loadHistoryTable();
+        } catch (loadError) {
+            console.error('Error loading history:', loadError);
+            error = loadError;
+        }
+        // Cached bodies belong to the old table; drop them only now that the
+        // new one replaces it
+        historyState = { mtime, table, error };
+        historyCache.clear();
+        historyLoad = null;
+        return historyState;
+    })();
+    return historyLoad;
+}
+
+// Reload the table. A load already in progress is shared: callers wait for it
+// and then for at most one follow-up load, so the file is never parsed by
+// several loads in parallel.
+function reloadHistoryTable() {
+    if (historyFollowUp) {
+        return historyFollowUp;
+    }
+    if (!historyLoad) {
+        return startHistoryLoad();
+    }
+    historyFollowUp = historyLoad.then(() => {
+        historyFollowUp = null;
+        return historyLoad || startHistoryLoad();
+    });
+    return historyFollowUp;
+}
+
+// Return the current load state, reloading when the CSV has been refreshed.
+// Overlapping refreshes collapse into the shared load from reloadHistoryTable.
+async function getHistoryTable() {
+    let state = historyLoad ? await historyLoad : historyState;
+    const mtime = await getDataMtime();
+    // A missing file or failed parse is remembered for that mtime and only
+    // retried once the file appears or changes, so a bad file is not
+    // re-parsed on every request
+    if (!state || mtime !== state.mtime) {
+        state = await reloadHistoryTable();
+    }
+    return state;
+}
+
+reloadHistoryTable();
+
+// Ask axios for the raw upstream body so JSON from the Python API can be
+// forwarded as-is instead of being parsed and re-serialized
+const RAW_JSON = { responseType: 'text' };
+
+function sendJson(res, body) {
+    res.type('application/json').send(body);
+}
+
+// Only bodies the upstream labelled as JSON are safe to forward unparsed;
+// FastAPI's plain-text 500 or a proxy's HTML error page are not
+function isJsonResponse(response) {
+    return /^application\/(.+\+)?json\b/i.test(response.headers[ 'content-type' ] || '');
+}
+
+// Proxy a GET to the Python API, serving repeated polls from the cache
+function cachedProxy(pythonPath) {
+    return async (req, res) => {
+        try {
+            const cached = cacheGet(responseCache, pythonPath);
+            if (cached !== undefined) {
+                return sendJson(res, cached);
+            }
+
+            const response = await pythonApi.get(pythonPath, RAW_JSON);
+            if (!isJsonResponse(response)) {
+                return res.status(502).json({ error: 'Unexpected response from Python API' });
+            }
+            cacheSet(responseCache, pythonPath, response.data, CACHE_TTL_MS, CACHE_MAX_ENTRIES);
+            sendJson(res, response.data);
+        } catch (error) {
+            res.status(500).json({ error: error.message });
+        }
+    };
+}
+
 // Root endpoint
 app.get('/', (req, res) => {
     res.json({
@@ -58,7 +298,8 @@ app.get('/', (req, res) => {
             history: '/api/history/:symbol',
             symbols: '/api/symbols',
             ensemble: '/api/ensemble/info',
-            backtest: '/api/backtest/results'
+            backtest: '/api/backtest/results',
+            cacheClear: '/api/cache/clear'
         }
     });
 });
@@ -66,7 +307,7 @@ app.get('/', (req, res) => {
 // Health check
 app.get('/api/health', async (req, res) => {
     try {
-        const response = await axios.get(`${PYTHON_API}/health`);
+        const response = await pythonApi.get('/health');
         res.json({
             status: 'ok',
             backend: 'online',
@@ -87,14 +328,7 @@ app.get('/api/health', async (req, res) => {
 });
 
 // Get system stats
-app.get('/api/stats', async (req, res) => {
-    try {
-        const response = await axios.get(`${PYTHON_API}/stats`);
-        res.json(response.data);
-    } catch (error) {
-        res.status(500).json({ error: error.message });
-    }
-});
+app.get('/api/stats', cachedProxy('/stats'));
 
 // Get historical data for a symbol
 app.get('/api/history/:symbol', async (req, res) => {
@@ -102,45 +336,51 @@ app.get('/api/history/:symbol', async (req, res) => {
         const { symbol } = req.params;
         const { points = 100 } = req.query;
 
-        // Read from processed data
-        const dataPath = path.join(__dirname, '../../processed/combined_1s.csv');
-
-        if (!fs.existsSync(dataPath)) {
+        const loaded = await getHistoryTable();
+        const historyTable = loaded.table;
+        if (loaded.error) {
+            return res.status(500).json({ error: `Failed to load history data: ${loaded.error.message}` });
+        }
+        if (!historyTable) {
             return res.status(404).json({ error: 'Data file not found' });
         }
 
-        // Read CSV file
-        const csvData = fs.readFileSync(dataPath, 'utf-8');
-        const lines = csvData.split('\n');
-        const headers = lines[ 0 ].split(',');
-
-        // Find symbol column index
-        const symbolIndex = headers.indexOf('symbol');
-        const datetimeIndex = headers.indexOf('datetime');
-        const priceIndex = headers.indexOf('price');
-        const volumeIndex = headers.indexOf('volume');
-
-        // Filter data for symbol
-        const symbolData = [];
-        for (let i = 1; i < lines.length; i++) {
-            const row = lines[ i ].split(',');
-            if (row[ symbolIndex ] === symbol) {
-                symbolData.push({
-                    datetime: row[ datetimeIndex ],
-                    price: parseFloat(row[ priceIndex ]),
-                    volume: parseFloat(row[ volumeIndex ] || 0)
+        const numPoints = parseInt(points);
+        const cacheKey = `${symbol}:${numPoints}`;
+        const cached = cacheGet(historyCache, cacheKey);
+        if (cached !== undefined) {
+            return sendJson(res, cached);
+        }
+
+        const columns = historyTable.get(symbol);
+        const totalPoints = columns ? columns.datetime.length : 0;
+
+        // Get last N points (same bounds as Array.prototype.slice(-N))
+        const lastPoints = [];
+        if (columns) {
+            const datetimes = columns.datetime.slice(-numPoints);
+            const start = totalPoints - datetimes.length;
+            for (let i = 0; i < datetimes.length; i++) {
+                lastPoints.push({
+                    datetime: datetimes[ i ],
+                    price: columns.price[ start + i ],
+                    volume: columns.volume[ start + i ]
                 });
             }
         }
 
-        // Get last N points
-        const lastPoints = symbolData.slice(-parseInt(points));
-
-        res.json({
+        const body = JSON.stringify({
             symbol,
             data: lastPoints,
-            total_points: symbolData.length
+            total_points: totalPoints
         });
+        // Only known symbols are cached, so arbitrary paths cannot fill the
+        // map, and only while this table is still current so a request that
+        // raced a reload cannot store a stale body
+        if (historyTable.has(symbol) && loaded === historyState) {
+            cacheSet(historyCache, cacheKey, body, HISTORY_CACHE_TTL_MS, HISTORY_CACHE_MAX_ENTRIES);
+        }
+        sendJson(res, body);
 
     } catch (error) {
         console.error('Error reading history:', error);
@@ -157,15 +397,21 @@ app.post('/api/predict', async (req, res) => {
             return res.status(400).json({ error: 'Symbol is required' });
         }
 
-        const response = await axios.post(`${PYTHON_API}/predict`, {
+        const response = await pythonApi.post('/predict', {
             symbol,
             window_seconds: window_seconds || 128
-        });
+        }, RAW_JSON);
 
-        res.json(response.data);
+        if (!isJsonResponse(response)) {
+            return res.status(502).json({ error: 'Unexpected response from Python API' });
+        }
+        sendJson(res, response.data);
     } catch (error) {
-        if (error.response) {
-            res.status(error.response.status).json(error.response.data);
+        if (error.response && isJsonResponse(error.response)) {
+            res.status(error.response.status);
+            sendJson(res, error.response.data);
+        } else if (error.response) {
+            res.status(error.response.status).json({ error: error.response.data || error.message });
         } else {
             res.status(500).json({ error: error.message });
         }
@@ -173,34 +419,13 @@ app.post('/api/predict', async (req, res) => {
 });
 
 // Get ensemble info
-app.get('/api/ensemble/info', async (req, res) => {
-    try {
-        const response = await axios.get(`${PYTHON_API}/ensemble/info`);
-        res.json(response.data);
-    } catch (error) {
-        res.status(500).json({ error: error.message });
-    }
-});
+app.get('/api/ensemble/info', cachedProxy('/ensemble/info'));
 
 // Get available symbols
-app.get('/api/symbols', async (req, res) => {
-    try {
-        const response = await axios.get(`${PYTHON_API}/symbols`);
-        res.json(response.data);
-    } catch (error) {
-        res.status(500).json({ error: error.message });
-    }
-});
+app.get('/api/symbols', cachedProxy('/symbols'));
 
 // Get backtest results
-app.get('/api/backtest/results', async (req, res) => {
-    try {
-        const response = await axios.get(`${PYTHON_API}/backtest/results`);
-        res.json(response.data);
-    } catch (error) {
-        res.status(500).json({ error: error.message });
-    }
-});
+app.get('/api/backtest/results', cachedProxy('/backtest/results'));
 
 // Batch predictions
 app.post('/api/predict/batch', async (req, res) => {
@@ -211,16 +436,20 @@ app.post('/api/predict/batch', async (req, res) => {
             return res.status(400).json({ error: 'Symbols array is required' });
         }
 
-        const predictions = await Promise.all(
-            symbols.map(async (symbol) => {
+        // Request each distinct symbol once, then map results back in order
+        const uniqueSymbols = [ ...new Set(symbols) ];
+        const results = await Promise.all(
+            uniqueSymbols.map(async (symbol) => {
                 try {
-                    const response = await axios.post(`${PYTHON_API}/predict`, { symbol });
+                    const response = await pythonApi.post('/predict', { symbol });
                     return response.data;
                 } catch (error) {
                     return { symbol, error: error.message };
                 }
             })
         );
+        const bySymbol = new Map(uniqueSymbols.map((symbol, i) => [ symbol, results[ i ] ]));
+        const predictions = symbols.map((symbol) => bySymbol.get(symbol));
 
         res.json({ predictions });
     } catch (error) {
@@ -228,6 +457,15 @@ app.post('/api/predict/batch', async (req, res) => {
     }
 });
 
+// Clear cached responses and reload the history table (manual invalidation
+// after a data refresh)
+app.post('/api/cache/clear', async (req, res) => {
+    const cleared = responseCache.size + historyCache.size;
+    responseCache.clear();
+    const { table } = await reloadHistoryTable();
+    res.json({ status: 'ok', cleared, history_loaded: table !== null });
+});
+
 // Error handling middleware
 app.use((err, req, res, next) => {
     console.error('Error:', err);
@@ -251,5 +489,6 @@ app.listen(PORT, () => {
     console.log('  GET  /api/ensemble/info');
     console.log('  GET  /api/symbols');
     console.log('  GET  /api/backtest/results');
+    console.log('  POST /api/cache/clear');
     console.log('═══════════════════════════════════════════════════════');
 });